@@ -0,0 +1,64 @@
+"""
+Redis Cache Helpers
+
+Read-through cache for hot GET endpoints. The cache is optional: when
+REDIS_URL is not configured every helper is a no-op, and when Redis is
+configured but unreachable the helpers swallow the connection error so
+handlers fall through to MongoDB either way.
+"""
+
+import os
+
+import orjson
+import redis.asyncio as redis
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+_redis = None
+
+redis_url = os.getenv("REDIS_URL")
+
+if redis_url:
+    _redis = redis.from_url(redis_url)
+
+CACHE_TTL_SECONDS = 60
+
+
+def cache_key(endpoint: str, **params) -> str:
+    """Stable cache key from normalized query arguments."""
+    parts = ":".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"{endpoint}:{parts}"
+
+
+async def cache_get(key: str):
+    """Return the cached value for key, or None on miss / Redis down."""
+    if _redis is None:
+        return None
+    try:
+        cached = await _redis.get(key)
+    except (redis.RedisError, OSError):
+        return None
+    return orjson.loads(cached) if cached else None
+
+
+async def cache_set(key: str, value, ttl: int = CACHE_TTL_SECONDS):
+    """Cache value under key with a short TTL."""
+    if _redis is None:
+        return
+    try:
+        await _redis.setex(key, ttl, orjson.dumps(value, default=str))
+    except (redis.RedisError, OSError):
+        pass
+
+
+async def cache_invalidate(endpoint: str):
+    """Drop all cached entries for an endpoint after a write."""
+    if _redis is None:
+        return
+    try:
+        async for key in _redis.scan_iter(f"{endpoint}:*"):
+            await _redis.delete(key)
+    except (redis.RedisError, OSError):
+        pass
@@ -5,7 +5,9 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -18,15 +20,56 @@ load_dotenv()
 _client = None
 db = None
 
+# Pre-bound collection handles so hot paths skip Database.__getitem__
+customers = None
+products = None
+orders = None
+supporttickets = None
+analyticsevents = None
+
+# Raw handle for pass-through reads: skips BSON -> dict decoding entirely
+products_raw = None
+
+# Name -> handle table so the helpers below skip db[name] per call too
+_collections = {}
+
+_RAW_CODEC = CodecOptions(document_class=RawBSONDocument)
+
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(
+        database_url,
+        maxPoolSize=200,
+        minPoolSize=20,
+        compressors="zstd,zlib",
+        retryWrites=True,
+        serverSelectionTimeoutMS=3000,
+    )
     db = _client[database_name]
+    customers = db["customer"]
+    products = db["product"]
+    orders = db["order"]
+    supporttickets = db["supportticket"]
+    analyticsevents = db["analyticsevent"]
+    products_raw = db.get_collection("product", codec_options=_RAW_CODEC)
+    _collections = {
+        "customer": customers,
+        "product": products,
+        "order": orders,
+        "supportticket": supporttickets,
+        "analyticsevent": analyticsevents,
+    }
+
+
+def _get_collection(collection_name: str):
+    """Prebound handle when we have one, db[name] for ad-hoc collections."""
+    collection = _collections.get(collection_name)
+    return collection if collection is not None else db[collection_name]
 
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -40,16 +83,20 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await _get_collection(collection_name).insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, sort: list = None, projection: dict = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
-    
-    cursor = db[collection_name].find(filter_dict or {})
-    if limit:
+
+    cursor = _get_collection(collection_name).find(filter_dict or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    # zero/negative limits mean "no limit", as with the old sync client
+    if limit and limit > 0:
         cursor = cursor.limit(limit)
-    
-    return list(cursor)
+        return await cursor.to_list(length=limit)
+
+    return await cursor.to_list(length=None)
@@ -1,40 +1,155 @@
+import asyncio
 import os
+import time
+from datetime import datetime, timezone
 from typing import List, Optional, Literal
-from fastapi import FastAPI, HTTPException, Query
+
+import orjson
+from bson import ObjectId, json_util
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, field_validator
+
+from cache import cache_key, cache_get, cache_set, cache_invalidate
+from database import db, products, products_raw, orders, analyticsevents, create_document, get_documents
+from schemas import EMAIL_RE, Customer, Product, Order, OrderItem, AnalyticsEvent, SupportTicket
+
+
+class MongoJSONResponse(ORJSONResponse):
+    """orjson response that knows how to encode ObjectId."""
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=self._default)
+
 
-from database import db, create_document, get_documents
-from schemas import Customer, Product, Order, OrderItem, AnalyticsEvent, SupportTicket
+app = FastAPI(title="Coral Shopping API", default_response_class=MongoJSONResponse)
 
-app = FastAPI(title="Coral Shopping API")
+# Explicit origin allowlist: "*" with credentials is invalid per the CORS
+# spec, and max_age lets browsers cache preflights for a day
+allowed_origins = os.getenv("ALLOWED_ORIGINS", "https://app.coral.example").split(",")
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=allowed_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type", "authorization"],
+    max_age=86400,
 )
 
 
+# Analytics events are fire-and-forget: buffer them and bulk-insert
+EVENT_BATCH_SIZE = 100
+EVENT_FLUSH_INTERVAL_SECONDS = 1.0
+_event_queue: asyncio.Queue = asyncio.Queue()
+
+
+async def flush_events():
+    """Drain the analytics queue into Mongo with insert_many batches."""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await _event_queue.get()]
+        deadline = loop.time() + EVENT_FLUSH_INTERVAL_SECONDS
+        while len(batch) < EVENT_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(_event_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        try:
+            await analyticsevents.insert_many(batch, ordered=False)
+        except Exception:
+            pass  # analytics must never take the API down
+
+
+@app.on_event("shutdown")
+async def drain_events():
+    """Flush any buffered analytics events before the worker exits."""
+    if analyticsevents is None:
+        return
+    batch = []
+    while not _event_queue.empty():
+        batch.append(_event_queue.get_nowait())
+    if batch:
+        try:
+            await analyticsevents.insert_many(batch, ordered=False)
+        except Exception:
+            pass  # analytics must never block shutdown
+
+
+@app.on_event("startup")
+async def create_indexes():
+    """Build the indexes backing the hot product/order queries."""
+    if db is None:
+        return
+    asyncio.create_task(flush_events())
+    await products.create_index([("category", 1), ("price", 1), ("rating", -1)])
+    await products.create_index([("tags", 1), ("price", 1)])
+    await products.create_index([("title", "text"), ("description", "text"), ("tags", "text")])
+    await orders.create_index([("customer_id", 1)])
+
+
+# Static payloads: serialized once at import, served with cache headers
+_STATIC_ETAG = '"v1"'
+_STATIC_HEADERS = {"Cache-Control": "public, max-age=3600", "ETag": _STATIC_ETAG}
+_ROOT_JSON = orjson.dumps({"message": "Coral Shopping Backend Running"})
+_SCHEMA_JSON = orjson.dumps({
+    "collections": [
+        "customer",
+        "product",
+        "order",
+        "supportticket",
+        "analyticsevent",
+    ]
+})
+
+
+def _static_response(body: bytes, request: Request) -> Response:
+    """Serve precomputed JSON, answering 304 on a matching If-None-Match."""
+    if request.headers.get("if-none-match") == _STATIC_ETAG:
+        return Response(status_code=304, headers=_STATIC_HEADERS)
+    return Response(body, media_type="application/json", headers=_STATIC_HEADERS)
+
+
 @app.get("/")
-def read_root():
-    return {"message": "Coral Shopping Backend Running"}
+def read_root(request: Request):
+    return _static_response(_ROOT_JSON, request)
 
 
 # ---- Schemas Endpoint (for viewer/tools) ----
 @app.get("/schema")
-def get_schema():
-    return {
-        "collections": [
-            "customer",
-            "product",
-            "order",
-            "supportticket",
-            "analyticsevent",
-        ]
-    }
+def get_schema(request: Request):
+    return _static_response(_SCHEMA_JSON, request)
+
+
+# Listing payloads: only what the UI renders, first image only
+PRODUCT_LIST_PROJECTION = {
+    "title": 1,
+    "price": 1,
+    "category": 1,
+    "images": {"$slice": 1},
+    "rating": 1,
+    "in_stock": 1,
+}
+
+# Same projection in aggregation syntax ($slice takes the array operand)
+PRODUCT_LIST_PROJECT_STAGE = {
+    "title": 1,
+    "price": 1,
+    "category": 1,
+    "images": {"$slice": ["$images", 1]},
+    "rating": 1,
+    "in_stock": 1,
+}
 
 
 # ---- Customers ----
@@ -44,54 +159,78 @@ class CreateCustomerRequest(BaseModel):
     phone: Optional[str] = None
     address: Optional[str] = None
 
+    @field_validator("email")
+    @classmethod
+    def _validate_email(cls, v: str) -> str:
+        if not EMAIL_RE.fullmatch(v):
+            raise ValueError("invalid email address")
+        return v
+
 
 @app.post("/customers")
-def create_customer(payload: CreateCustomerRequest):
-    data = Customer(
+async def create_customer(payload: CreateCustomerRequest):
+    # payload is already validated; skip re-validating in the schema model
+    data = Customer.model_construct(
         full_name=payload.full_name,
         email=payload.email,
         phone=payload.phone,
         addresses=[payload.address] if payload.address else [],
     )
-    inserted_id = create_document("customer", data)
+    inserted_id = await create_document("customer", data)
+    await cache_invalidate("customers")
     return {"id": inserted_id}
 
 
 @app.get("/customers")
-def list_customers(limit: int = 50):
-    docs = get_documents("customer", {}, limit)
-    for d in docs:
-        d["_id"] = str(d["_id"])  # serialize
-    return {"items": docs}
+async def list_customers(limit: int = 50):
+    key = cache_key("customers", limit=limit)
+    cached = await cache_get(key)
+    if cached is not None:
+        return cached
+    docs = await get_documents("customer", {}, limit, projection={"full_name": 1, "email": 1, "phone": 1, "is_active": 1})
+    result = {"items": docs}
+    await cache_set(key, result)
+    return result
 
 
 # ---- Products ----
 class CreateProductRequest(BaseModel):
+    # mirrors Product's bounds, which model_construct no longer enforces
     title: str
     description: Optional[str] = None
-    price: float
+    price: float = Field(..., ge=0)
     category: Literal['foodstuffs', 'gifts', 'hampers', 'household', 'office']
     images: Optional[List[str]] = []
     in_stock: bool = True
-    stock_qty: Optional[int] = 0
+    stock_qty: Optional[int] = Field(0, ge=0)
     tags: Optional[List[str]] = []
 
 
 @app.post("/products")
-def create_product(payload: CreateProductRequest):
-    data = Product(**payload.model_dump())
-    inserted_id = create_document("product", data)
+async def create_product(payload: CreateProductRequest):
+    # payload is already validated; skip re-validating in the schema model
+    data = Product.model_construct(**payload.model_dump())
+    inserted_id = await create_document("product", data)
+    await cache_invalidate("products")
+    await cache_invalidate("recommendations")
     return {"id": inserted_id}
 
 
 @app.get("/products")
-def get_products(
+async def get_products(
     category: Optional[str] = None,
     q: Optional[str] = None,
-    minPrice: Optional[float] = Query(None, ge=0),
-    maxPrice: Optional[float] = Query(None, ge=0),
+    minPrice: Optional[float] = None,
+    maxPrice: Optional[float] = None,
     limit: int = 50,
 ):
+    # manual bounds check: cheaper than Pydantic constraint dispatch here
+    if minPrice is not None and minPrice < 0:
+        raise HTTPException(status_code=422, detail="minPrice must be >= 0")
+    if maxPrice is not None and maxPrice < 0:
+        raise HTTPException(status_code=422, detail="maxPrice must be >= 0")
+    if limit < 1:
+        raise HTTPException(status_code=422, detail="limit must be >= 1")
     filter_dict: dict = {}
     if category:
         filter_dict["category"] = category
@@ -103,17 +242,30 @@ def get_products(
             price_filter["$lte"] = float(maxPrice)
         filter_dict["price"] = price_filter
     if q:
-        # simple text search on title/description
-        filter_dict["$or"] = [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"tags": {"$regex": q, "$options": "i"}},
-        ]
-
-    docs = get_documents("product", filter_dict, limit)
-    for d in docs:
-        d["_id"] = str(d["_id"])  # serialize
-    return {"items": docs}
+        # text index on title/description/tags (built at startup)
+        filter_dict["$text"] = {"$search": q}
+
+    key = cache_key("products", category=category, q=q, minPrice=minPrice, maxPrice=maxPrice, limit=limit)
+    cached = await cache_get(key)
+    if cached is not None:
+        return cached
+    # single round-trip: page and total count share one index scan
+    pipeline = [
+        {"$match": filter_dict},
+        {"$facet": {
+            "items": [
+                {"$sort": {"price": 1}},
+                {"$limit": limit},
+                {"$project": PRODUCT_LIST_PROJECT_STAGE},
+            ],
+            "total": [{"$count": "n"}],
+        }},
+    ]
+    facet = (await products.aggregate(pipeline).to_list(length=1))[0]
+    total = facet["total"][0]["n"] if facet["total"] else 0
+    result = {"items": facet["items"], "total": total}
+    await cache_set(key, result)
+    return result
 
 
 # ---- AI-like Recommendations (rule-based MVP) ----
@@ -124,7 +276,7 @@ class RecommendationRequest(BaseModel):
 
 
 @app.post("/recommendations")
-def get_recommendations(req: RecommendationRequest):
+async def get_recommendations(req: RecommendationRequest):
     filter_dict: dict = {}
     if req.budget_min is not None or req.budget_max is not None:
         price_filter = {}
@@ -140,12 +292,15 @@ def get_recommendations(req: RecommendationRequest):
             {"tags": {"$in": req.preferences}},
         ]
 
-    items = get_documents("product", filter_dict, 24)
-    # naive sort for "value" - lowest price first
-    items.sort(key=lambda x: (x.get("price", 0), -x.get("rating", 0)))
-    for d in items:
-        d["_id"] = str(d["_id"])  # serialize
-    return {"items": items}
+    key = cache_key("recommendations", budget_min=req.budget_min, budget_max=req.budget_max, preferences=req.preferences)
+    cached = await cache_get(key)
+    if cached is not None:
+        return cached
+    # "value" ordering - lowest price first, done server-side on the index
+    items = await get_documents("product", filter_dict, 24, sort=[("price", 1), ("rating", -1)], projection=PRODUCT_LIST_PROJECTION)
+    result = {"items": items}
+    await cache_set(key, result)
+    return result
 
 
 # ---- Comparison ----
@@ -154,16 +309,30 @@ class CompareRequest(BaseModel):
 
 
 @app.post("/compare")
-def compare_products(req: CompareRequest):
-    from bson import ObjectId
+async def compare_products(req: CompareRequest):
+    """Compare full product documents by id.
+
+    Unlike the other endpoints, documents are passed through from raw
+    BSON and encoded as MongoDB Extended JSON: ``_id`` is
+    ``{"$oid": "..."}`` and timestamps are ``{"$date": ...}``.
+    """
+    bad = [x for x in req.ids if not ObjectId.is_valid(x)]
+    if bad:
+        raise HTTPException(status_code=400, detail=f"invalid product ids: {bad}")
     ids = [ObjectId(x) for x in req.ids]
-    docs = list(db["product"].find({"_id": {"$in": ids}}))
-    for d in docs:
-        d["_id"] = str(d["_id"])  # serialize
-    return {"items": docs}
+    # raw BSON pass-through: no dict decode, json_util encodes bson types
+    docs = await products_raw.find({"_id": {"$in": ids}}).to_list(length=len(ids))
+    return Response(
+        json_util.dumps({"items": docs}),
+        media_type="application/json",
+        headers={"X-Response-Format": "mongodb-extended-json"},
+    )
 
 
 # ---- Orders ----
+SHIPPING_FEES = {"delivery": 1200, "pickup": 0}
+
+
 class CreateOrderRequest(BaseModel):
     customer_id: str
     items: List[OrderItem]
@@ -173,13 +342,14 @@ class CreateOrderRequest(BaseModel):
 
 
 @app.post("/orders")
-def create_order(req: CreateOrderRequest):
+async def create_order(req: CreateOrderRequest):
     # compute totals
-    subtotal = sum([it.unit_price * it.quantity for it in req.items])
-    shipping_fee = 1200 if req.delivery_option == 'delivery' else 0
+    subtotal = sum(it.unit_price * it.quantity for it in req.items)
+    shipping_fee = SHIPPING_FEES[req.delivery_option]
     total = subtotal + shipping_fee
 
-    order = Order(
+    # fields come from the validated request model; skip re-validation
+    order = Order.model_construct(
         customer_id=req.customer_id,
         items=req.items,
         subtotal=subtotal,
@@ -193,7 +363,8 @@ def create_order(req: CreateOrderRequest):
         notes=req.notes,
     )
 
-    inserted_id = create_document("order", order)
+    inserted_id = await create_document("order", order)
+    order_ref = inserted_id[:6].upper()
     return {
         "id": inserted_id,
         "bank_transfer_instructions": {
@@ -201,36 +372,50 @@ def create_order(req: CreateOrderRequest):
             "bank": "GTBank",
             "account_number": "0123456789",
             "amount": total,
-            "narration": f"ORDER-{inserted_id[:6].upper()}"
+            "narration": "ORDER-" + order_ref
         }
     }
 
 
 @app.get("/orders")
-def list_orders(customer_id: Optional[str] = None, limit: int = 50):
+async def list_orders(customer_id: Optional[str] = None, limit: int = 50):
     filter_dict = {"customer_id": customer_id} if customer_id else {}
-    docs = get_documents("order", filter_dict, limit)
-    for d in docs:
-        d["_id"] = str(d["_id"])  # serialize
+    # line items are only needed when viewing a single customer's orders
+    projection = None if customer_id else {"items": 0}
+    docs = await get_documents("order", filter_dict, limit, projection=projection)
     return {"items": docs}
 
 
 # ---- Analytics ----
-@app.post("/analytics")
-def track_event(event: AnalyticsEvent):
-    create_document("analyticsevent", event)
+@app.post("/analytics", status_code=202)
+async def track_event(event: AnalyticsEvent):
+    # without a database the flusher never starts; don't grow the queue
+    if analyticsevents is None:
+        raise HTTPException(status_code=503, detail="Database not available")
+    data = event.model_dump()
+    data['created_at'] = datetime.now(timezone.utc)
+    data['updated_at'] = datetime.now(timezone.utc)
+    await _event_queue.put(data)
     return {"status": "ok"}
 
 
 # ---- Support Tickets ----
 @app.post("/support")
-def open_ticket(ticket: SupportTicket):
-    inserted_id = create_document("supportticket", ticket)
+async def open_ticket(ticket: SupportTicket):
+    inserted_id = await create_document("supportticket", ticket)
     return {"id": inserted_id}
 
 
+# Health checks hit /test every tick; cache the probe results so each
+# call doesn't cost a Mongo admin command. Env vars never change at runtime.
+COLLECTIONS_CACHE_TTL_SECONDS = 30
+_collections_cache = {"t": 0.0, "v": []}
+_DATABASE_URL_SET = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
+_DATABASE_NAME_SET = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
+
+
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -248,8 +433,10 @@ def test_database():
             response["connection_status"] = "Connected"
 
             try:
-                collections = db.list_collection_names()
-                response["collections"] = collections[:10]
+                if time.monotonic() - _collections_cache["t"] > COLLECTIONS_CACHE_TTL_SECONDS:
+                    _collections_cache["v"] = await db.list_collection_names()
+                    _collections_cache["t"] = time.monotonic()
+                response["collections"] = _collections_cache["v"][:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
                 response["database"] = f"⚠️  Connected but Error: {str(e)[:50]}"
@@ -258,8 +445,8 @@ def test_database():
     except Exception as e:
         response["database"] = f"❌ Error: {str(e)[:50]}"
 
-    response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-    response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
+    response["database_url"] = _DATABASE_URL_SET
+    response["database_name"] = _DATABASE_NAME_SET
 
     return response
 
@@ -267,4 +454,12 @@ def test_database():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+    )
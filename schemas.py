@@ -5,19 +5,31 @@ Each Pydantic model represents a collection in your MongoDB database.
 Collection name is the lowercase of the class name (e.g., Product -> "product").
 """
 
-from pydantic import BaseModel, Field, EmailStr
+import re
+
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Literal
 from datetime import datetime
 
+# Lightweight email syntax check; avoids email-validator's per-call cost
+EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
 
 class Customer(BaseModel):
     full_name: str = Field(..., description="Customer full name")
-    email: EmailStr = Field(..., description="Customer email")
+    email: str = Field(..., description="Customer email")
     phone: Optional[str] = Field(None, description="Nigerian phone number")
     addresses: Optional[List[str]] = Field(default_factory=list, description="Saved delivery addresses")
     balance: float = Field(0, ge=0, description="Account balance for credits/refunds")
     is_active: bool = Field(True)
 
+    @field_validator("email")
+    @classmethod
+    def _validate_email(cls, v: str) -> str:
+        if not EMAIL_RE.fullmatch(v):
+            raise ValueError("invalid email address")
+        return v
+
 
 class Product(BaseModel):
     title: str = Field(..., description="Product title")
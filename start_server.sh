@@ -15,5 +15,8 @@ mkdir -p logs
 echo "Installing dependencies..."
 pip install -r requirements.txt
 echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+# --workers is mutually exclusive with --reload; use WEB_CONCURRENCY=1 plus
+# a manual restart when live-reloading during development
+WORKERS=${WEB_CONCURRENCY:-$(nproc)}
+nohup uvicorn main:app --host 0.0.0.0 --port 8000 --workers "$WORKERS" --loop uvloop --http httptools --log-level warning > logs/server.log 2>&1
 echo "Server started in background"